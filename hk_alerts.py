@@ -0,0 +1,294 @@
+"""
+港股成交额提醒规则引擎
+
+规则文件(JSON)示例：
+{
+    "watchlist": ["00700", "09988"],
+    "rules": [
+        {"name": "自选股放量", "codes": "watchlist", "conditions": [["均额倍数", ">", 2]]},
+        {"name": "腾讯放量", "codes": ["00700"], "conditions": [["均额倍数", ">", 2]]},
+        {"name": "大额爆量", "conditions": [["最近交易日成交额", ">", 1e8], ["增长比例", ">", 3]]}
+    ]
+}
+
+规则在加载时一次性编译为按字段排列的阈值向量，评估时对
+(变化行 × 规则) 做整体向量化比较，规则数增加到数百条时评估开销基本不变。
+每次只评估与上一快照相比发生变化的股票，同一股票同一规则持续满足时只提醒一次。
+"""
+import argparse
+import datetime
+import json
+import operator
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+# 规则中可使用的英文别名
+FIELD_ALIASES = {
+    'turnover': '最近交易日成交额',
+    'previous_turnover': '前一交易日成交额',
+    'growth': '增长比例',
+    'avg_turnover_10': '前10日平均成交额',
+    'avg_multiple': '均额倍数',
+}
+
+# 规则可引用的字段：compute_turnover_growth 输出的数值列及派生字段
+RULE_FIELDS = {'最近交易日成交额', '前一交易日成交额', '增长比例', '前10日平均成交额', '均额倍数'}
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+}
+
+# 不满足任何条件时的中性阈值
+NEUTRAL_BOUNDS = {'>': -np.inf, '>=': -np.inf, '<': np.inf, '<=': np.inf}
+# 同一字段同一运算符的多个阈值中最严格者
+TIGHTEST = {'>': max, '>=': max, '<': min, '<=': min}
+
+
+def load_rules(path):
+    """读取规则文件，返回 (规则列表, 自选股列表)"""
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    if isinstance(config, list):
+        return config, []
+    return config.get('rules', []), config.get('watchlist', [])
+
+
+def prepare_snapshot(snapshot):
+    """补充派生字段并以股票代码为索引"""
+    df = snapshot.drop_duplicates(subset='代码', keep='last').set_index('代码')
+    if '最近交易日成交额' in df.columns and '前10日平均成交额' in df.columns:
+        df['均额倍数'] = df['最近交易日成交额'] / df['前10日平均成交额'].where(df['前10日平均成交额'] > 0)
+    return df
+
+
+class CompiledRules:
+    """
+    编译后的规则集
+    bounds[字段][运算符] 为长度等于规则数的阈值向量，未使用该条件的规则取中性值
+    """
+
+    def __init__(self, rules, watchlist=()):
+        watchlist = [str(code).zfill(5) for code in watchlist]
+        self.names = []
+        self.bounds = {}
+        self.scoped = np.zeros(len(rules), dtype=bool)
+        code_rules = {}
+
+        for idx, rule in enumerate(rules):
+            name = rule.get('name') or f'规则{idx + 1}'
+            conditions = rule.get('conditions') or []
+            if not conditions:
+                raise ValueError(f"规则 {name} 没有任何条件")
+            self.names.append(name)
+
+            for field, op, value in conditions:
+                field = FIELD_ALIASES.get(field, field)
+                if field not in RULE_FIELDS:
+                    raise ValueError(
+                        f"规则 {name} 使用了未知字段: {field}，可选: {', '.join(sorted(RULE_FIELDS | set(FIELD_ALIASES)))}"
+                    )
+                if op not in OPERATORS:
+                    raise ValueError(f"规则 {name} 使用了不支持的运算符: {op}")
+                field_bounds = self.bounds.setdefault(field, {})
+                if op not in field_bounds:
+                    field_bounds[op] = np.full(len(rules), NEUTRAL_BOUNDS[op])
+                # 同一规则内条件为"且"关系：同字段同方向的多个条件取最严格的阈值
+                field_bounds[op][idx] = TIGHTEST[op](field_bounds[op][idx], float(value))
+
+            codes = rule.get('codes')
+            if codes == 'watchlist':
+                codes = watchlist
+            if codes is not None:
+                # 指定了股票范围（即使为空）的规则只对名单内股票生效
+                self.scoped[idx] = True
+                for code in codes:
+                    code_rules.setdefault(str(code).zfill(5), []).append(idx)
+
+        self.code_rules = {code: np.array(idxs) for code, idxs in code_rules.items()}
+        self.fields = list(self.bounds)
+
+    def __len__(self):
+        return len(self.names)
+
+    def evaluate(self, df):
+        """返回 (行数 × 规则数) 的布尔矩阵"""
+        fired = np.ones((len(df), len(self)), dtype=bool)
+
+        for field, field_bounds in self.bounds.items():
+            if field in df.columns:
+                values = pd.to_numeric(df[field], errors='coerce').to_numpy(dtype=float)[:, None]
+            else:
+                values = np.full((len(df), 1), np.nan)
+            for op, bounds in field_bounds.items():
+                # NaN 与任何阈值比较均为 False，中性阈值处需单独放行
+                fired &= OPERATORS[op](values, bounds[None, :]) | np.isinf(bounds)[None, :]
+
+        # 指定股票的规则只对名单内股票生效
+        allowed = np.broadcast_to(~self.scoped, fired.shape).copy()
+        for row, code in enumerate(df.index):
+            idxs = self.code_rules.get(code)
+            if idxs is not None:
+                allowed[row, idxs] = True
+
+        return fired & allowed
+
+
+class AlertEngine:
+    """增量提醒引擎：只评估发生变化的行，并对持续满足的规则去重"""
+
+    def __init__(self, rules, watchlist=(), sinks=None):
+        self.rules = CompiledRules(rules, watchlist)
+        self.sinks = sinks if sinks is not None else [StdoutSink()]
+        self._last = pd.DataFrame()
+        self._active = {}
+
+    def _changed_rows(self, df):
+        """与上一快照相比新增或规则相关字段发生变化的行"""
+        fields = [field for field in self.rules.fields if field in df.columns]
+        current = df[fields]
+        if self._last.empty:
+            return current.index
+
+        previous = self._last.reindex(index=current.index, columns=current.columns)
+        same = (current == previous) | (current.isna() & previous.isna())
+        is_new = ~current.index.isin(self._last.index)
+        return current.index[~same.all(axis=1).to_numpy() | is_new]
+
+    def evaluate(self, snapshot):
+        """评估新快照，返回本次新触发的提醒列表"""
+        if snapshot is None or snapshot.empty or not len(self.rules):
+            return []
+
+        df = prepare_snapshot(snapshot)
+        changed = self._changed_rows(df)
+        fields = [field for field in self.rules.fields if field in df.columns]
+        if self._last.empty:
+            self._last = df[fields].copy()
+        else:
+            self._last = pd.concat([self._last[~self._last.index.isin(df.index)], df[fields]])
+        if changed.empty:
+            return []
+
+        rows = df.loc[changed]
+        fired = self.rules.evaluate(rows)
+        previous = np.array([
+            self._active.get(code, np.zeros(len(self.rules), dtype=bool)) for code in changed
+        ])
+        new_fires = fired & ~previous
+        for row, code in enumerate(changed):
+            self._active[code] = fired[row]
+
+        fire_rows, fire_rules = np.nonzero(new_fires)
+        value_fields = [field for field in self.rules.fields if field in rows.columns]
+        values = rows[value_fields].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=float)
+        names = rows['名称'].tolist() if '名称' in rows.columns else [None] * len(rows)
+
+        timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+        row_values = {}
+        alerts = []
+        for row, idx in zip(fire_rows.tolist(), fire_rules.tolist()):
+            if row not in row_values:
+                row_values[row] = {
+                    field: (None if np.isnan(value) else float(value))
+                    for field, value in zip(value_fields, values[row])
+                }
+            alerts.append({
+                'time': timestamp,
+                'rule': self.rules.names[idx],
+                'code': changed[row],
+                'name': names[row],
+                'values': row_values[row],
+            })
+
+        if alerts:
+            for sink in self.sinks:
+                try:
+                    sink.emit(alerts)
+                except Exception as e:
+                    print(f"提醒发送失败({type(sink).__name__}): {e}")
+        return alerts
+
+
+class StdoutSink:
+    """打印到控制台"""
+
+    def emit(self, alerts):
+        for alert in alerts:
+            print(f"[提醒] {alert['time']} {alert['rule']}: {alert['code']} {alert['name'] or ''} {alert['values']}")
+
+
+class FileSink:
+    """以JSON Lines格式追加写入本地文件"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def emit(self, alerts):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            for alert in alerts:
+                f.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+class WebhookSink:
+    """以JSON POST到本地Webhook地址"""
+
+    def __init__(self, url, timeout=5):
+        self.url = url
+        self.timeout = timeout
+
+    def emit(self, alerts):
+        body = json.dumps({'alerts': alerts}, ensure_ascii=False).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, headers={'Content-Type': 'application/json; charset=utf-8'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+
+def build_sinks(file_path=None, webhook_url=None, stdout=True):
+    sinks = []
+    if stdout:
+        sinks.append(StdoutSink())
+    if file_path:
+        sinks.append(FileSink(file_path))
+    if webhook_url:
+        sinks.append(WebhookSink(webhook_url))
+    return sinks
+
+
+def main():
+    from hk_volume_filter import get_high_volume_stocks, compute_turnover_growth
+
+    parser = argparse.ArgumentParser(description='港股成交额提醒')
+    parser.add_argument('rules', help='规则文件路径(JSON)')
+    parser.add_argument('--interval', type=int, default=0, help='重复评估间隔(秒)，0表示只运行一次')
+    parser.add_argument('--output', help='提醒追加写入的文件')
+    parser.add_argument('--webhook', help='提醒POST地址')
+    args = parser.parse_args()
+
+    try:
+        rules, watchlist = load_rules(args.rules)
+        engine = AlertEngine(rules, watchlist, build_sinks(args.output, args.webhook))
+    except (OSError, ValueError) as e:
+        print(f"加载规则失败: {e}")
+        sys.exit(1)
+    print(f"已加载 {len(engine.rules)} 条规则")
+
+    while True:
+        snapshot = compute_turnover_growth(get_high_volume_stocks())
+        alerts = engine.evaluate(snapshot)
+        print(f"本轮新触发提醒 {len(alerts)} 条")
+        if args.interval <= 0:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
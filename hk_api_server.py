@@ -0,0 +1,360 @@
+"""
+港股成交量筛选结果本地HTTP/JSON服务
+
+以JSON形式提供最新一次分析结果、成交额TOP10及单只股票指标：
+- GET /api/status                     缓存状态
+- GET /api/results?bucket=50%&min_ratio=2&min_turnover=1e8&code=00700&limit=20
+- GET /api/top10
+- GET /api/stocks/<代码>
+
+所有响应均来自内存缓存，只有一次完整分析结束后才整体替换缓存；
+轮询客户端不会触发任何重新计算或上游数据请求。
+支持 ETag/If-None-Match 条件请求及 gzip 压缩。
+"""
+import argparse
+import datetime
+import gzip
+import hashlib
+import json
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pandas as pd
+
+from hk_volume_filter import get_high_volume_stocks, compute_turnover_growth, classify_growth, GROWTH_THRESHOLDS
+from hk_alerts import AlertEngine, build_sinks, load_rules
+
+# 小于该字节数的响应不压缩
+GZIP_MIN_BYTES = 512
+# 每个缓存版本最多保留的不同查询响应数
+MAX_CACHED_RESPONSES = 256
+
+
+class QueryError(ValueError):
+    """请求参数不合法"""
+
+
+def _records(df):
+    """DataFrame转为可JSON序列化的记录列表"""
+    if df is None or df.empty:
+        return []
+    return json.loads(df.to_json(orient='records', force_ascii=False, date_format='iso'))
+
+
+def _limit_param(params):
+    value = params.get('limit')
+    if value is None or value == '':
+        return None
+    if not (value.isascii() and value.isdigit()):
+        raise QueryError(f"参数 limit 必须是非负整数: {value}")
+    return int(value)
+
+
+def _float_param(params, name):
+    value = params.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        raise QueryError(f"参数 {name} 必须是数字: {value}")
+    if not math.isfinite(number):
+        raise QueryError(f"参数 {name} 必须是有限数字: {value}")
+    return number
+
+
+class ResultCache:
+    """
+    分析结果内存缓存
+    publish() 在一次分析完成后原子替换快照，同时清空已序列化的响应
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._responses = {}
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def publish(self, analysis_df, top10=None, spot=None):
+        """发布新一轮分析结果"""
+        previous = self._snapshot
+        snapshot = {
+            'version': (previous['version'] + 1) if previous else 1,
+            'generated_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'analysis': analysis_df,
+            'buckets': classify_growth(analysis_df),
+            'top10': top10 if top10 is not None else pd.DataFrame(),
+            'spot': spot if spot is not None else pd.DataFrame(),
+        }
+        with self._lock:
+            self._snapshot = snapshot
+            self._responses = {}
+        return snapshot['version']
+
+    def get_response(self, key, build):
+        """
+        返回 key 对应的已序列化响应，同一版本内只构建一次
+        build(snapshot) 返回可JSON序列化的对象
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            entry = self._responses.get(key)
+        if entry is not None:
+            return entry
+
+        body = json.dumps(build(snapshot), ensure_ascii=False).encode('utf-8')
+        digest = hashlib.sha1(body).hexdigest()[:20]
+        entry = {
+            'body': body,
+            'gzip': gzip.compress(body) if len(body) >= GZIP_MIN_BYTES else None,
+            'etag': f'"{snapshot["version"]}-{digest}"',
+        }
+
+        with self._lock:
+            # 构建期间缓存已被替换时不写入旧版本响应
+            if self._snapshot is snapshot:
+                if len(self._responses) >= MAX_CACHED_RESPONSES:
+                    self._responses.clear()
+                self._responses[key] = entry
+        return entry
+
+
+def build_status(snapshot):
+    analysis = snapshot['analysis']
+    return {
+        'version': snapshot['version'],
+        'generated_at': snapshot['generated_at'],
+        'analysed': len(analysis),
+        'buckets': {label: len(df) for label, df in snapshot['buckets'].items()},
+    }
+
+
+def build_results(snapshot, params):
+    """按分档及阈值参数过滤分析结果"""
+    bucket = params.get('bucket') or 'all'
+    if bucket == 'all':
+        df = snapshot['analysis']
+    elif bucket in snapshot['buckets']:
+        df = snapshot['buckets'][bucket]
+    else:
+        raise QueryError(f"未知分档: {bucket}，可选: all, {', '.join(GROWTH_THRESHOLDS)}")
+
+    min_ratio = _float_param(params, 'min_ratio')
+    min_turnover = _float_param(params, 'min_turnover')
+    limit = _limit_param(params)
+    code = params.get('code')
+
+    if not df.empty:
+        mask = pd.Series(True, index=df.index)
+        if min_ratio is not None:
+            mask &= df['增长比例'] > min_ratio
+        if min_turnover is not None:
+            mask &= df['最近交易日成交额'] > min_turnover
+        if code:
+            mask &= df['代码'].isin([c.strip().zfill(5) for c in code.split(',')])
+        df = df[mask]
+        if limit is not None:
+            df = df.head(limit)
+
+    return {
+        'version': snapshot['version'],
+        'generated_at': snapshot['generated_at'],
+        'bucket': bucket,
+        'count': len(df),
+        'data': _records(df),
+    }
+
+
+def build_top10(snapshot):
+    return {
+        'version': snapshot['version'],
+        'generated_at': snapshot['generated_at'],
+        'data': _records(snapshot['top10']),
+    }
+
+
+def build_stock(snapshot, code):
+    """单只股票指标：实时成交额、增长比例及所在分档"""
+    code = code.zfill(5)
+    analysis = snapshot['analysis']
+    spot = snapshot['spot']
+
+    row = analysis[analysis['代码'] == code] if not analysis.empty else analysis
+    spot_row = spot[spot['代码'] == code] if not spot.empty else spot
+    if row.empty and spot_row.empty:
+        return None
+
+    metrics = _records(row)[0] if not row.empty else {}
+    return {
+        'version': snapshot['version'],
+        'generated_at': snapshot['generated_at'],
+        'code': code,
+        'spot': _records(spot_row)[0] if not spot_row.empty else None,
+        'metrics': metrics or None,
+        'buckets': [
+            label for label, ratio in GROWTH_THRESHOLDS.items()
+            if metrics and metrics['增长比例'] > ratio
+        ],
+    }
+
+
+def run_analysis(cache, alert_engine=None):
+    """执行一次完整分析并发布到缓存，如配置了提醒引擎则同时评估新快照"""
+    try:
+        spot = get_high_volume_stocks()
+        if spot.empty:
+            # get_high_volume_stocks 出错时返回空表，保留旧快照
+            print("未获取到实时行情，保留当前缓存")
+            return
+        analysis_df = compute_turnover_growth(spot)
+        if analysis_df.empty:
+            print("未获取到有效分析结果，保留当前缓存")
+            return
+        # 高成交额股票已包含成交额前10名，直接复用本轮实时行情
+        top10 = spot.sort_values(by='成交额', ascending=False).head(10)
+        version = cache.publish(analysis_df, top10=top10, spot=spot)
+        print(f"缓存已更新至版本 {version}，共 {len(analysis_df)} 条分析结果")
+        if alert_engine is not None:
+            alert_engine.evaluate(analysis_df)
+    except Exception as e:
+        # 失败时保留旧快照
+        print(f"刷新分析结果时出错: {e}")
+
+
+def refresh_loop(cache, interval, alert_engine=None):
+    """后台刷新线程：启动时运行一次，之后每 interval 秒运行一次（interval<=0 时只运行一次）"""
+    while True:
+        run_analysis(cache, alert_engine)
+        if interval <= 0:
+            return
+        time.sleep(interval)
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """只读JSON接口，所有数据来自 server.cache"""
+
+    server_version = 'HKVolumeAPI/1.0'
+
+    def do_GET(self):
+        cache = self.server.cache
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip('/')
+        params = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+
+        if cache.snapshot is None:
+            self._send_error(503, '分析结果尚未生成，请稍后重试', retry_after=30)
+            return
+
+        if path == '/api/status':
+            key = ('status',)
+            build = build_status
+        elif path == '/api/results':
+            key = ('results', tuple(sorted(params.items())))
+            build = lambda snapshot: build_results(snapshot, params)
+        elif path == '/api/top10':
+            key = ('top10',)
+            build = build_top10
+        elif path.startswith('/api/stocks/'):
+            code = path[len('/api/stocks/'):]
+            key = ('stock', code.zfill(5))
+            build = lambda snapshot: build_stock(snapshot, code)
+        else:
+            self._send_error(404, f'未知路径: {parsed.path}')
+            return
+
+        try:
+            entry = cache.get_response(key, build)
+        except QueryError as e:
+            self._send_error(400, str(e))
+            return
+
+        if entry['body'] == b'null':
+            self._send_error(404, f'未找到股票: {key[-1]}')
+            return
+
+        self._send_entry(entry)
+
+    def _send_entry(self, entry):
+        if_none_match = self.headers.get('If-None-Match', '')
+        etags = [tag.strip() for tag in if_none_match.split(',')]
+        if entry['etag'] in etags or '*' in etags:
+            self.send_response(304)
+            self.send_header('ETag', entry['etag'])
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            return
+
+        use_gzip = entry['gzip'] is not None and 'gzip' in self.headers.get('Accept-Encoding', '')
+        body = entry['gzip'] if use_gzip else entry['body']
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('ETag', entry['etag'])
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Vary', 'Accept-Encoding')
+        if use_gzip:
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, retry_after=None):
+        body = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if retry_after:
+            self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 轮询请求频繁，不逐条打印访问日志
+        pass
+
+
+def create_server(cache, host='127.0.0.1', port=8600):
+    server = ThreadingHTTPServer((host, port), ApiRequestHandler)
+    server.daemon_threads = True
+    server.cache = cache
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='港股成交量筛选结果本地JSON服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8600)
+    parser.add_argument('--refresh-interval', type=int, default=0,
+                        help='自动重新分析间隔(秒)，0表示只在启动时分析一次')
+    parser.add_argument('--alert-rules', help='提醒规则文件(JSON)，每次分析完成后评估')
+    parser.add_argument('--alert-output', help='提醒追加写入的文件')
+    args = parser.parse_args()
+
+    alert_engine = None
+    if args.alert_rules:
+        rules, watchlist = load_rules(args.alert_rules)
+        alert_engine = AlertEngine(rules, watchlist, build_sinks(args.alert_output))
+
+    cache = ResultCache()
+    threading.Thread(
+        target=refresh_loop, args=(cache, args.refresh_interval, alert_engine), daemon=True
+    ).start()
+
+    server = create_server(cache, args.host, args.port)
+    print(f"JSON服务已启动: http://{args.host}:{args.port}/api/status")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("服务已停止")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
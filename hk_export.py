@@ -0,0 +1,146 @@
+"""
+分块导出分析结果及历史窗口数据
+
+导出文件只在请求时生成，按块写入磁盘，不在内存中拼出完整文件：
+- CSV：逐块追加（utf-8-sig，与 save_results 一致）
+- Parquet：每块写为一个 row group（需安装 pyarrow）
+- Excel：openpyxl 只写模式逐行写入（需安装 openpyxl），超出单表行数上限时自动分表
+
+数据源：
+- 分析结果：iter_frame_chunks(df)
+- 历史窗口：iter_history_chunks(store)，从 hk_history 的环形缓冲区按股票分批生成长表
+
+分块只限于生成文件的过程。Streamlit 的 download_button 会把整个文件读入其内存媒体存储，
+因此网页下载时每次导出仍会占用一份完整文件大小的内存（下载后释放）。
+"""
+import os
+import tempfile
+
+import pandas as pd
+
+from hk_history import history_store
+
+EXPORT_FORMATS = {
+    'csv': ('text/csv', '.csv'),
+    'parquet': ('application/vnd.apache.parquet', '.parquet'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', '.xlsx'),
+}
+CHUNK_ROWS = 5000
+# Excel 单个工作表最大行数（含表头）
+EXCEL_MAX_ROWS = 1048576
+
+
+class ExportError(RuntimeError):
+    """导出失败（格式不支持或缺少可选依赖）"""
+
+
+def iter_frame_chunks(df, chunk_rows=CHUNK_ROWS):
+    """按行切分 DataFrame"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def iter_history_chunks(store=history_store, codes=None, codes_per_chunk=200):
+    """按股票分批把历史窗口展开为长表：代码、日期、成交量、收盘价、成交额"""
+    codes = store.codes() if codes is None else [code for code in codes if code in store]
+    for start in range(0, len(codes), codes_per_chunk):
+        frames = []
+        for code in codes[start:start + codes_per_chunk]:
+            frame = store.get(code).to_frame()
+            frame.insert(0, 'code', code)
+            frames.append(frame)
+        if frames:
+            chunk = pd.concat(frames, ignore_index=True)
+            yield chunk.rename(columns={
+                'code': '代码', 'date': '日期', 'volume': '成交量', 'close': '收盘价', 'turnover': '成交额'
+            })
+
+
+def iter_csv_bytes(chunks):
+    """把数据块流式编码为CSV字节，只有第一块带表头和BOM"""
+    first = True
+    for chunk in chunks:
+        text = chunk.to_csv(index=False, header=first)
+        yield text.encode('utf-8-sig' if first else 'utf-8')
+        first = False
+
+
+def _write_csv(chunks, path):
+    with open(path, 'wb') as f:
+        for data in iter_csv_bytes(chunks):
+            f.write(data)
+
+
+def _write_parquet(chunks, path):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("导出Parquet需要安装 pyarrow: pip install pyarrow")
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pd.DataFrame().to_parquet(path)
+
+
+def _write_excel(chunks, path):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("导出Excel需要安装 openpyxl: pip install openpyxl")
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows_in_sheet = 0
+    header = None
+    for chunk in chunks:
+        if header is None:
+            header = list(chunk.columns)
+        # 日期列转为字符串，避免逐个单元格做类型推断
+        for col in chunk.columns:
+            if pd.api.types.is_datetime64_any_dtype(chunk[col]):
+                chunk = chunk.assign(**{col: chunk[col].dt.strftime('%Y-%m-%d')})
+        for row in chunk.itertuples(index=False, name=None):
+            if sheet is None or rows_in_sheet >= EXCEL_MAX_ROWS:
+                sheet = workbook.create_sheet(f"Sheet{len(workbook.worksheets) + 1}")
+                sheet.append(header)
+                rows_in_sheet = 1
+            sheet.append(row)
+            rows_in_sheet += 1
+    if sheet is None:
+        workbook.create_sheet('Sheet1')
+    workbook.save(path)
+
+
+_WRITERS = {'csv': _write_csv, 'parquet': _write_parquet, 'xlsx': _write_excel}
+
+
+def write_export(chunks, fmt, path):
+    """把数据块写入 path，返回 path"""
+    if fmt not in _WRITERS:
+        raise ExportError(f"不支持的导出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+    try:
+        _WRITERS[fmt](chunks, path)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path
+
+
+def export_to_tempfile(chunks, fmt):
+    """写入临时文件并返回路径，由调用方负责删除"""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"不支持的导出格式: {fmt}，可选: {', '.join(EXPORT_FORMATS)}")
+    fd, path = tempfile.mkstemp(prefix='hk_export_', suffix=EXPORT_FORMATS[fmt][1])
+    os.close(fd)
+    return write_export(chunks, fmt, path)
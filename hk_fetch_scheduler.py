@@ -0,0 +1,164 @@
+"""
+按相关性排序的历史数据抓取调度
+
+逐只抓取历史数据是分析中最耗时的部分。调度器按预期相关性
+（实时成交额、当日涨跌幅、上次分析的增长比例）排序后依次抓取并流式返回结果，
+并支持"TOP N 即可"模式：
+- 估计的增长比例上界低于当前第 N 名的股票不再抓取
+- 超出时间预算时提前结束
+
+增长比例上界 = 实时成交额 × 容差 / 前一交易日成交额，前一交易日成交额取自上次分析缓存。
+该上界只是估计（实时成交额与 成交量×收盘价 并不严格一致），不保证 TOP N 完全准确；
+并且只有实时行情日期与历史数据最近交易日相同（实时成交额对应的正是"最近交易日"）时才启用，
+否则只按优先级排序并受时间预算限制。缓存中没有对应日期数据的股票上界视为无穷大，必须抓取。
+"""
+import datetime
+import heapq
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from hk_volume_filter import analyze_stock, load_prior_growth, save_prior_growth
+
+# 排序权重：实时成交额、涨跌幅绝对值、上次增长比例（均按百分位排名）
+PRIORITY_WEIGHTS = {'成交额': 0.4, '涨跌幅': 0.3, '增长比例': 0.3}
+# 实时成交额与 成交量×收盘价 之间的估计误差容差
+BOUND_SLACK = 1.5
+
+
+def prioritize(stocks, prior=None):
+    """按预期相关性降序排列待抓取股票"""
+    if stocks.empty:
+        return stocks
+
+    scored = stocks.copy()
+    score = pd.Series(0.0, index=scored.index)
+
+    score += PRIORITY_WEIGHTS['成交额'] * scored['成交额'].rank(pct=True).fillna(0)
+    if '涨跌幅' in scored.columns:
+        volatility = pd.to_numeric(scored['涨跌幅'], errors='coerce').abs()
+        score += PRIORITY_WEIGHTS['涨跌幅'] * volatility.rank(pct=True).fillna(0)
+    if prior is not None and not prior.empty:
+        prior_ratio = scored['代码'].map(prior.set_index('代码')['增长比例'])
+        # 没有历史记录的股票给中等分，避免新上榜股票被排到最后
+        score += PRIORITY_WEIGHTS['增长比例'] * prior_ratio.rank(pct=True).fillna(0.5)
+
+    scored['优先级'] = score
+    return scored.sort_values('优先级', ascending=False).drop(columns='优先级')
+
+
+def estimate_ratio_bounds(stocks, prior, previous_date, slack=BOUND_SLACK):
+    """
+    根据上次分析缓存估计每只股票增长比例的上界（估计值，非严格上界）
+    previous_date 为本轮分析中的"前一交易日"，无法估计的股票上界为无穷大
+    """
+    bounds = pd.Series(np.inf, index=stocks['代码'].values)
+    if prior is None or prior.empty or previous_date is None:
+        return bounds
+
+    prior = prior.set_index('代码')
+    previous_turnover = pd.Series(np.nan, index=prior.index)
+    # 上次分析的最近交易日即本轮前一交易日
+    as_recent = prior['最近交易日'] == previous_date
+    previous_turnover[as_recent] = prior.loc[as_recent, '最近交易日成交额']
+    # 上次分析与本轮前一交易日相同（同日重复运行）
+    as_previous = prior['前一交易日'] == previous_date
+    previous_turnover[as_previous] = prior.loc[as_previous, '前一交易日成交额']
+
+    known = previous_turnover.reindex(bounds.index)
+    spot_turnover = pd.Series(stocks['成交额'].values, index=bounds.index)
+    estimated = spot_turnover * slack / known.where(known > 0)
+    return estimated.fillna(np.inf)
+
+
+class FetchScheduler:
+    """按优先级流式抓取并计算增长比例"""
+
+    def __init__(self, stocks, prior=None, fetch=analyze_stock, spot_date=None):
+        self.prior = load_prior_growth() if prior is None else prior
+        # 实时行情对应的日期，默认为获取行情的当天
+        self.spot_date = spot_date or datetime.date.today().isoformat()
+        self.stocks = prioritize(stocks, self.prior)
+        self.fetch = fetch
+        self.stats = {}
+
+    def stream(self, top_n=None, time_budget=None):
+        """
+        依优先级逐只抓取并产出分析结果(dict)
+        top_n: 只关心前 N 名时，跳过估计上界低于当前第 N 名的股票（仅当实时行情日期与最近交易日一致时启用）
+        time_budget: 时间预算(秒)，超出后停止
+        """
+        start = time.time()
+        top_heap = []  # 当前前 N 名的增长比例（小顶堆）
+        bounds = None
+        fetched = skipped = 0
+        stop_reason = 'completed'
+
+        for _, stock in self.stocks.iterrows():
+            code = stock['代码']
+
+            if time_budget is not None and time.time() - start > time_budget:
+                stop_reason = 'time_budget'
+                break
+
+            if top_n and bounds is not None and len(top_heap) >= top_n:
+                if bounds.get(code, math.inf) <= top_heap[0]:
+                    skipped += 1
+                    continue
+
+            result = self.fetch(code, stock['名称'])
+            fetched += 1
+            if result is None:
+                continue
+
+            # 第一条结果确定本轮的交易日后再估计上界；
+            # 历史数据最近交易日不是实时行情当天时（盘中或数据延迟），实时成交额不能代表最近交易日成交额，不做剪枝
+            if top_n and bounds is None:
+                if result['最近交易日'] == self.spot_date:
+                    bounds = estimate_ratio_bounds(self.stocks, self.prior, result['前一交易日'])
+                else:
+                    bounds = pd.Series(np.inf, index=self.stocks['代码'].values)
+
+            if top_n:
+                if len(top_heap) < top_n:
+                    heapq.heappush(top_heap, result['增长比例'])
+                elif result['增长比例'] > top_heap[0]:
+                    heapq.heapreplace(top_heap, result['增长比例'])
+
+            yield result
+
+        if stop_reason == 'completed' and skipped:
+            stop_reason = 'top_n_pruned'
+        self.stats = {
+            'total': len(self.stocks),
+            'fetched': fetched,
+            'skipped': skipped,
+            'stop_reason': stop_reason,
+            'elapsed': time.time() - start,
+        }
+
+    def run(self, top_n=None, time_budget=None, on_result=None):
+        """
+        执行调度并返回按增长比例降序排列的分析表
+        on_result(result, 已产出条数, 待抓取总数) 在每条结果产出时回调，可用于进度显示
+        """
+        results = []
+        for result in self.stream(top_n=top_n, time_budget=time_budget):
+            results.append(result)
+            if on_result is not None:
+                on_result(result, len(results), len(self.stocks))
+
+        print(
+            f"抓取 {self.stats['fetched']}/{self.stats['total']} 支，"
+            f"跳过 {self.stats['skipped']} 支，耗时 {self.stats['elapsed']:.1f} 秒"
+            f"（{self.stats['stop_reason']}）"
+        )
+
+        if not results:
+            return pd.DataFrame()
+
+        analysis_df = pd.DataFrame(results)
+        save_prior_growth(analysis_df)
+        return analysis_df.sort_values(by='增长比例', ascending=False).reset_index(drop=True)
@@ -0,0 +1,172 @@
+"""
+固定窗口的日线历史存储
+
+ak.stock_hk_daily 会返回一只股票上市以来的全部日线。分析只用到最近若干个交易日，
+因此在数据到达后立即截取尾部窗口，写入每只股票固定长度的环形缓冲区，
+完整 DataFrame 随即释放。日期转换、排序等处理只作用于窗口内的行，
+内存占用和单只股票的处理开销只与窗口大小有关，与上市年限无关。
+"""
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+
+# 默认保留的交易日数量（需覆盖所有指标所需窗口：增长比例2日、10日均额11日、
+# 月度增长需当前月+两个完整月+窗口截断处的一个月，约70日）
+HISTORY_WINDOW = 70
+
+
+def _tail_window(hist_data, window):
+    """截取按日期升序排列的最近 window 行，只对窗口内数据做日期转换"""
+    if hist_data.empty:
+        return hist_data
+
+    first = pd.Timestamp(hist_data['date'].iloc[0])
+    last = pd.Timestamp(hist_data['date'].iloc[-1])
+    if last >= first:
+        tail = hist_data.iloc[-window:]
+    else:
+        # 数据源按日期降序返回
+        tail = hist_data.iloc[:window].iloc[::-1]
+
+    dates = pd.to_datetime(tail['date'])
+    if not dates.is_monotonic_increasing:
+        # 数据源无序时退回整表排序
+        dates_all = pd.to_datetime(hist_data['date'])
+        tail = hist_data.assign(date=dates_all).sort_values('date').iloc[-window:]
+        dates = tail['date']
+
+    return pd.DataFrame({
+        'date': dates.values.astype('datetime64[D]'),
+        'volume': pd.to_numeric(tail['volume'], errors='coerce').to_numpy(dtype=float),
+        'close': pd.to_numeric(tail['close'], errors='coerce').to_numpy(dtype=float),
+    })
+
+
+class HistoryRingBuffer:
+    """单只股票固定长度的日线环形缓冲区（按日期升序）"""
+
+    __slots__ = ('size', 'dates', 'volume', 'close', '_start', '_len')
+
+    def __init__(self, size=HISTORY_WINDOW):
+        self.size = size
+        self.dates = np.empty(size, dtype='datetime64[D]')
+        self.volume = np.empty(size, dtype=float)
+        self.close = np.empty(size, dtype=float)
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    @property
+    def last_date(self):
+        if not self._len:
+            return None
+        return self.dates[(self._start + self._len - 1) % self.size]
+
+    def extend(self, dates, volume, close):
+        """
+        追加按日期升序的新数据：早于最后一条的忽略，
+        与最后一条同日的覆盖（盘中数据更新），之后的依次写入
+        返回实际新增的交易日数量
+        """
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        volume = np.asarray(volume, dtype=float)
+        close = np.asarray(close, dtype=float)
+
+        last_date = self.last_date
+        if last_date is not None:
+            same = np.nonzero(dates == last_date)[0]
+            if len(same):
+                pos = (self._start + self._len - 1) % self.size
+                self.volume[pos] = volume[same[-1]]
+                self.close[pos] = close[same[-1]]
+            newer = dates > last_date
+            dates, volume, close = dates[newer], volume[newer], close[newer]
+
+        count = len(dates)
+        if count >= self.size:
+            self.dates[:] = dates[-self.size:]
+            self.volume[:] = volume[-self.size:]
+            self.close[:] = close[-self.size:]
+            self._start, self._len = 0, self.size
+            return count
+
+        positions = (self._start + self._len + np.arange(count)) % self.size
+        self.dates[positions] = dates
+        self.volume[positions] = volume
+        self.close[positions] = close
+
+        overflow = max(0, self._len + count - self.size)
+        self._start = (self._start + overflow) % self.size
+        self._len = min(self.size, self._len + count)
+        return count
+
+    def tail(self, n=None):
+        """返回最近 n 条 (日期, 成交量, 收盘价)，按日期升序"""
+        n = self._len if n is None else min(n, self._len)
+        positions = (self._start + self._len - n + np.arange(n)) % self.size
+        return self.dates[positions], self.volume[positions], self.close[positions]
+
+    def turnover(self, n=None):
+        """最近 n 个交易日的成交额（成交量 × 收盘价）"""
+        dates, volume, close = self.tail(n)
+        return dates, volume * close
+
+    def to_frame(self):
+        dates, volume, close = self.tail()
+        return pd.DataFrame({'date': dates, 'volume': volume, 'close': close, 'turnover': volume * close})
+
+
+class HistoryStore:
+    """按股票代码管理环形缓冲区"""
+
+    def __init__(self, window=HISTORY_WINDOW):
+        self.window = window
+        self._buffers = {}
+        self._fetched_on = {}  # 代码 -> 最近一次抓取日线的日期
+        self._lock = threading.Lock()
+
+    def __contains__(self, code):
+        return code in self._buffers
+
+    def __len__(self):
+        return len(self._buffers)
+
+    def codes(self):
+        return list(self._buffers)
+
+    def get(self, code):
+        return self._buffers.get(code)
+
+    def fetched_on(self, code):
+        """最近一次为该股票写入日线数据的日期（未抓取过为 None）"""
+        return self._fetched_on.get(code)
+
+    def ingest(self, code, hist_data):
+        """
+        写入一只股票的日线数据，只保留尾部窗口
+        返回对应的缓冲区；数据为空时返回已有缓冲区（可能为 None）
+        """
+        self._fetched_on[code] = datetime.date.today()
+        window = _tail_window(hist_data, self.window)
+        if window.empty:
+            return self._buffers.get(code)
+
+        with self._lock:
+            buffer = self._buffers.get(code)
+            if buffer is None:
+                buffer = self._buffers[code] = HistoryRingBuffer(self.window)
+            buffer.extend(window['date'].values, window['volume'].values, window['close'].values)
+        return buffer
+
+    def clear(self):
+        with self._lock:
+            self._buffers.clear()
+            self._fetched_on.clear()
+
+
+# 进程内共享的历史存储
+history_store = HistoryStore()
@@ -0,0 +1,181 @@
+"""
+周/月成交额汇总
+
+从 hk_history 中已抓取的日线窗口增量生成周、月成交额，不需要额外的上游请求。
+每只股票只保留最近若干个周期的累计成交额；有新交易日到达时只更新当前（未完成）周期，
+同一交易日数据被盘中更新时按差额修正当前周期。
+
+生成的增长表与日线分析表列名一致（代码、名称、最近交易日成交额、前一交易日成交额、增长比例、
+最近交易日、前一交易日），可直接用于 classify_growth 分档及各类图表，
+此时"交易日"列中是周期标签（如 2026-W42、2026-10）。
+"""
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from hk_history import history_store
+
+# 支持的汇总周期
+PERIOD_LABELS = {'W': '周', 'M': '月'}
+# 每只股票保留的周期数量
+MAX_PERIODS = 6
+
+
+def period_keys(dates, freq):
+    """日期数组 -> 周期键（周：该周周一；月：该月）"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    if freq == 'W':
+        days = dates.astype('int64')
+        # 1970-01-01 是周四，(days + 3) % 7 为周一起算的星期序号
+        return dates - ((days + 3) % 7)
+    if freq == 'M':
+        return dates.astype('datetime64[M]')
+    raise ValueError(f"不支持的周期: {freq}，可选: {', '.join(PERIOD_LABELS)}")
+
+
+def period_label(key, freq):
+    if freq == 'W':
+        year, week, _ = pd.Timestamp(key).isocalendar()
+        return f"{year}-W{week:02d}"
+    return str(key)
+
+
+class PeriodTurnover:
+    """单只股票按周期累计的成交额（按时间升序，最后一个为当前周期）"""
+
+    __slots__ = ('freq', 'periods', 'last_date', 'last_turnover', 'head_key')
+
+    def __init__(self, freq, max_periods=MAX_PERIODS):
+        self.freq = freq
+        self.periods = deque(maxlen=max_periods)  # [周期键, 累计成交额, 交易日数]
+        self.last_date = None
+        self.last_turnover = 0.0
+        # 首次载入时窗口截断处的周期，数据不完整，不参与比较
+        self.head_key = None
+
+    def update(self, dates, turnover):
+        """写入按日期升序的日线成交额，只处理不早于最后一条的数据"""
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        turnover = np.asarray(turnover, dtype=float)
+
+        if self.last_date is not None:
+            same = np.nonzero(dates == self.last_date)[0]
+            if len(same) and self.periods:
+                # 同一交易日盘中更新：按差额修正当前周期
+                value = turnover[same[-1]]
+                self.periods[-1][1] += value - self.last_turnover
+                self.last_turnover = value
+            newer = dates > self.last_date
+            dates, turnover = dates[newer], turnover[newer]
+
+        if not len(dates):
+            return 0
+
+        keys = period_keys(dates, self.freq)
+        if self.last_date is None:
+            self.head_key = keys[0]
+
+        # keys 单调递增，按边界分组求和
+        starts = np.concatenate([[0], np.nonzero(keys[1:] != keys[:-1])[0] + 1])
+        sums = np.add.reduceat(turnover, starts)
+        counts = np.diff(np.append(starts, len(keys)))
+
+        for key, total, count in zip(keys[starts], sums, counts):
+            if self.periods and self.periods[-1][0] == key:
+                self.periods[-1][1] += float(total)
+                self.periods[-1][2] += int(count)
+            else:
+                self.periods.append([key, float(total), int(count)])
+
+        self.last_date = dates[-1]
+        self.last_turnover = float(turnover[-1])
+        return len(dates)
+
+    def comparable(self, include_current=False):
+        """返回可比较的最近两个周期；include_current=False 时不使用当前未完成周期"""
+        periods = list(self.periods)
+        if not include_current:
+            periods = periods[:-1]
+        periods = [p for p in periods if p[0] != self.head_key]
+        if len(periods) < 2:
+            return None
+        return periods[-1], periods[-2]
+
+
+class PeriodTurnoverTable:
+    """所有股票的某一周期成交额汇总，从 HistoryStore 增量同步"""
+
+    def __init__(self, freq, store=history_store, max_periods=MAX_PERIODS):
+        period_keys(np.array([], dtype='datetime64[D]'), freq)  # 校验周期
+        self.freq = freq
+        self.store = store
+        self.max_periods = max_periods
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """只把每只股票新到达（或盘中更新）的交易日写入当前周期"""
+        updated = 0
+        with self._lock:
+            for code in self.store.codes():
+                buffer = self.store.get(code)
+                if buffer is None or not len(buffer):
+                    continue
+                series = self._series.get(code)
+                if series is None:
+                    series = self._series[code] = PeriodTurnover(self.freq, self.max_periods)
+                    dates, turnover = buffer.turnover()
+                else:
+                    if series.last_date is not None and buffer.last_date < series.last_date:
+                        continue
+                    # 新数据通常只有一两个交易日，先取尾部少量数据
+                    dates, turnover = buffer.turnover(8)
+                    if dates[0] > series.last_date:
+                        dates, turnover = buffer.turnover()
+                if series.update(dates, turnover):
+                    updated += 1
+        return updated
+
+    def growth_table(self, names=None, include_current=False):
+        """最近两个可比较周期的成交额及增长比例，列名与日线分析表一致"""
+        self.sync()
+        names = names if names is not None else {}
+        rows = []
+        with self._lock:
+            for code, series in self._series.items():
+                if names and code not in names:
+                    continue
+                pair = series.comparable(include_current)
+                if pair is None:
+                    continue
+                recent, previous = pair
+                if not previous[1] > 0:
+                    continue
+                rows.append({
+                    '代码': code,
+                    '名称': names.get(code, ''),
+                    '最近交易日成交额': recent[1],
+                    '前一交易日成交额': previous[1],
+                    '增长比例': recent[1] / previous[1],
+                    '最近交易日': period_label(recent[0], self.freq),
+                    '前一交易日': period_label(previous[0], self.freq),
+                })
+
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows)
+        return df.sort_values(by='增长比例', ascending=False).reset_index(drop=True)
+
+
+# 进程内共享的周/月汇总表
+period_tables = {freq: PeriodTurnoverTable(freq) for freq in PERIOD_LABELS}
+
+
+def compute_period_growth(freq, names=None, include_current=False):
+    """
+    周/月成交额增长表
+    names: 代码 -> 名称，可传入日线分析表的 dict(zip(代码, 名称))；给定时只返回其中的股票
+    """
+    return period_tables[freq].growth_table(names, include_current)
@@ -1,4 +1,5 @@
 import akshare as ak
+import numpy as np
 import pandas as pd
 import datetime
 import os
@@ -6,6 +7,7 @@ import time
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from hk_history import history_store
 
 def get_recent_trading_days(days=5):
     """获取最近的交易日（简化版，使用工作日）"""
@@ -69,7 +71,9 @@ def get_high_volume_stocks():
             print(f"共获取 {len(spot_data)} 支港股数据")
             print(f"成交额大于3000万港元的股票: {len(high_volume_stocks)} 支")
             
-            return high_volume_stocks[['代码', '名称', '成交额']].reset_index(drop=True)
+            # 保留涨跌幅、最新价、成交量（如有），用于抓取优先级排序及增量更新
+            columns = ['代码', '名称', '成交额'] + [col for col in ['涨跌幅', '最新价', '成交量'] if col in spot_data.columns]
+            return high_volume_stocks[columns].reset_index(drop=True)
         else:
             print("警告: 无法找到成交额列，将返回空结果")
             return pd.DataFrame(columns=['代码', '名称', '成交额'])
@@ -78,14 +82,215 @@ def get_high_volume_stocks():
         print(f"获取实时行情数据时出错: {e}")
         return pd.DataFrame(columns=['代码', '名称', '成交额'])
 
-def analyze_volume_growth(high_volume_stocks):
+# 增长比例分档阈值
+GROWTH_THRESHOLDS = {'50%': 1.5, '100%': 2.0, '200%': 3.0}
+
+# 上一次分析结果缓存
+PRIOR_GROWTH_PATH = os.path.join('results', 'cache', 'prior_growth.csv')
+
+def empty_growth_results():
+    """返回空的分档结果"""
+    return {label: pd.DataFrame() for label in GROWTH_THRESHOLDS}
+
+def analyze_stock(code, name, store=history_store):
     """
-    第二阶段：对筛选后的股票进行历史数据分析
-    改为比较前两个完整交易日的成交额
+    获取单只股票历史数据，计算最近两个交易日成交额及增长比例
+    历史数据只保留尾部窗口写入 store，数据不足或获取失败时返回 None
+    """
+    try:
+        # 获取历史数据，截取尾部窗口后立即释放完整数据
+        hist_data = ak.stock_hk_daily(symbol=code, adjust="")
+        time.sleep(0.3)  # 减少延时
+        buffer = store.ingest(code, hist_data)
+        del hist_data
+        
+        return growth_from_buffer(code, name, buffer)
+        
+    except Exception as e:
+        print(f"分析股票 {code} {name} 时出错: {e}")
+        return None
+
+def growth_from_buffer(code, name, buffer):
+    """根据历史窗口计算最近两个交易日成交额及增长比例，数据不足时返回 None"""
+    # 确保至少有两条历史记录
+    if buffer is None or len(buffer) < 2:
+        return None
+    
+    # 最近11个交易日：最近交易日 + 前10个交易日
+    dates, turnover = buffer.turnover(11)
+    
+    # 成交额 = 成交量 * 收盘价
+    recent_turnover = float(turnover[-1])  # 最近交易日
+    previous_turnover = float(turnover[-2])  # 前一交易日
+    
+    # 前10个交易日平均成交额（不含最近交易日）
+    avg_turnover_10 = float(turnover[:-1].mean())
+    
+    # 确保前一日成交额不为0
+    if not previous_turnover > 0:
+        return None
+    
+    return {
+        '代码': code,
+        '名称': name,
+        '最近交易日成交额': recent_turnover,
+        '前一交易日成交额': previous_turnover,
+        '增长比例': recent_turnover / previous_turnover,
+        '前10日平均成交额': avg_turnover_10,
+        '最近交易日': str(dates[-1]),
+        '前一交易日': str(dates[-2])
+    }
+
+def is_trading_session(now=None):
+    """是否处于交易日开盘之后（简化版：工作日9:30之后，节假日由 spot_is_live 进一步判断）"""
+    now = now or datetime.datetime.now()
+    return now.weekday() < 5 and (now.hour, now.minute) >= (9, 30)
+
+def spot_is_live(high_volume_stocks, store, today):
+    """
+    实时行情是否为当日新数据：
+    工作日开盘后，且多数股票的实时成交量与历史中当日之前最后一根日线不同
+    （节假日或开盘前行情仍停留在上一交易日，成交量不会变化）
+    """
+    if not {'最新价', '成交量'}.issubset(high_volume_stocks.columns) or not is_trading_session():
+        return False
+    
+    today = np.datetime64(today)
+    evidence = []
+    for stock in high_volume_stocks.itertuples(index=False):
+        buffer = store.get(stock.代码)
+        if buffer is None or not len(buffer):
+            continue
+        dates, volume, _ = buffer.tail(2)
+        if dates[-1] >= today:
+            # 日线数据中已出现当日数据
+            evidence.append(True)
+            continue
+        evidence.append(not np.isclose(float(stock.成交量), volume[-1]))
+    return bool(evidence) and np.mean(evidence) >= 0.5
+
+def growth_with_spot_bar(code, name, buffer, today, volume, price):
+    """
+    以实时行情作为当日数据计算增长比例，不修改历史存储：
+    最近交易日 = 当日实时数据，前一交易日及10日均额取自当日之前的完整日线
+    """
+    if buffer is None or not len(buffer):
+        return None
+    
+    dates, turnover = buffer.turnover(12)
+    complete = dates < np.datetime64(today)
+    dates, turnover = dates[complete][-10:], turnover[complete][-10:]
+    if not len(turnover):
+        return None
+    
+    recent_turnover = float(volume) * float(price)
+    previous_turnover = float(turnover[-1])
+    if not previous_turnover > 0:
+        return None
+    
+    return {
+        '代码': code,
+        '名称': name,
+        '最近交易日成交额': recent_turnover,
+        '前一交易日成交额': previous_turnover,
+        '增长比例': recent_turnover / previous_turnover,
+        '前10日平均成交额': float(turnover.mean()),
+        '最近交易日': today,
+        '前一交易日': str(dates[-1])
+    }
+
+def last_completed_session(today):
+    """当日之前最近的工作日（简化版，不识别节假日）"""
+    day = datetime.date.fromisoformat(today) - datetime.timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= datetime.timedelta(days=1)
+    return day.isoformat()
+
+def needs_history(code, store, today):
+    """
+    是否需要（重新）抓取日线：历史存储中没有该股票，
+    或最后一根日线早于最近完整交易日且当日尚未抓取过（节假日时每天只重试一次）
+    """
+    buffer = store.get(code)
+    if buffer is None or not len(buffer):
+        return True
+    if buffer.last_date >= np.datetime64(last_completed_session(today)):
+        return False
+    return store.fetched_on(code) != datetime.date.fromisoformat(today)
+
+def update_turnover_growth(high_volume_stocks, store=history_store, on_progress=None):
+    """
+    增量更新分析表：只对历史存储中没有的股票，或日线未包含最近完整交易日的股票抓取历史数据。
+    实时行情确为当日新数据时，所有股票统一以实时数据作为最近交易日（只在计算中叠加，不写入历史存储）；
+    否则所有股票统一使用历史日线的最近两个交易日
+    on_progress(已处理数, 总数) 在抓取历史数据时回调
+    """
+    if high_volume_stocks.empty:
+        return pd.DataFrame()
+    
+    today = datetime.date.today().isoformat()
+    
+    # 补齐缺少的股票，并为日线已过期的股票追加新交易日
+    missing = [
+        stock for stock in high_volume_stocks.itertuples(index=False)
+        if needs_history(stock.代码, store, today)
+    ]
+    for idx, stock in enumerate(missing):
+        analyze_stock(stock.代码, stock.名称, store)
+        if on_progress is not None:
+            on_progress(idx + 1, len(missing))
+    
+    live = spot_is_live(high_volume_stocks, store, today)
+    
+    analysis_results = []
+    for stock in high_volume_stocks.itertuples(index=False):
+        buffer = store.get(stock.代码)
+        if live:
+            result = growth_with_spot_bar(stock.代码, stock.名称, buffer, today, stock.成交量, stock.最新价)
+        else:
+            result = growth_from_buffer(stock.代码, stock.名称, buffer)
+        if result is not None:
+            analysis_results.append(result)
+    
+    print(
+        f"增量更新 {len(high_volume_stocks)} 支股票，其中抓取/更新历史数据 {len(missing)} 支，"
+        f"{'使用当日实时行情' if live else '使用历史日线'}"
+    )
+    
+    if not analysis_results:
+        return pd.DataFrame()
+    
+    analysis_df = pd.DataFrame(analysis_results)
+    return analysis_df.sort_values(by='增长比例', ascending=False).reset_index(drop=True)
+
+def load_prior_growth(path=PRIOR_GROWTH_PATH):
+    """读取上一次分析结果缓存，用于抓取排序及增长比例上界估计"""
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    try:
+        return pd.read_csv(path, dtype={'代码': str}, encoding='utf-8-sig')
+    except Exception as e:
+        print(f"读取历史分析缓存时出错: {e}")
+        return pd.DataFrame()
+
+def save_prior_growth(analysis_df, path=PRIOR_GROWTH_PATH):
+    """将本次分析结果合并写入缓存（按代码覆盖旧记录）"""
+    if analysis_df.empty:
+        return
+    prior = load_prior_growth(path)
+    if not prior.empty:
+        analysis_df = pd.concat([prior[~prior['代码'].isin(analysis_df['代码'])], analysis_df])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    analysis_df.to_csv(path, index=False, encoding='utf-8-sig')
+
+def compute_turnover_growth(high_volume_stocks):
+    """
+    逐只获取历史数据，计算前两个完整交易日的成交额及增长比例
+    返回按增长比例降序排列的完整分析表（未分档）
     """
     if high_volume_stocks.empty:
         print("没有符合条件的股票需要分析")
-        return {'50%': pd.DataFrame(), '100%': pd.DataFrame(), '200%': pd.DataFrame()}
+        return pd.DataFrame()
     
     print(f"开始分析 {len(high_volume_stocks)} 支高成交额股票的历史数据...")
     
@@ -93,7 +298,7 @@ def analyze_volume_growth(high_volume_stocks):
     trading_days = get_recent_trading_days(5)
     if len(trading_days) < 3:
         print("无法获取足够的交易日数据")
-        return {'50%': pd.DataFrame(), '100%': pd.DataFrame(), '200%': pd.DataFrame()}
+        return pd.DataFrame()
     
     # 使用前两个完整的交易日进行比较
     recent_date = trading_days[1]  # 最近一个完整交易日
@@ -106,74 +311,52 @@ def analyze_volume_growth(high_volume_stocks):
     
     # 分析每只股票
     for idx, stock in high_volume_stocks.iterrows():
-        code = stock['代码']
-        name = stock['名称']
-        
-        try:
-            # 获取历史数据
-            hist_data = ak.stock_hk_daily(symbol=code, adjust="")
-            time.sleep(0.3)  # 减少延时
+        result = analyze_stock(stock['代码'], stock['名称'])
+        if result is not None:
+            analysis_results.append(result)
             
-            if not hist_data.empty:
-                hist_data['date'] = pd.to_datetime(hist_data['date'])
-                hist_data = hist_data.sort_values(by='date', ascending=False)
-                
-                # 确保至少有两条历史记录
-                if len(hist_data) >= 2:
-                    # 获取最近两个交易日的数据
-                    recent_record = hist_data.iloc[0]  # 最近交易日
-                    previous_record = hist_data.iloc[1]  # 前一交易日
-                    
-                    # 计算成交额 (成交量 * 收盘价)
-                    recent_turnover = float(recent_record['volume']) * float(recent_record['close'])
-                    previous_turnover = float(previous_record['volume']) * float(previous_record['close'])
-                    
-                    # 确保前一日成交额不为0
-                    if previous_turnover > 0:
-                        growth_ratio = recent_turnover / previous_turnover
-                        
-                        analysis_results.append({
-                            '代码': code,
-                            '名称': name,
-                            '最近交易日成交额': recent_turnover,
-                            '前一交易日成交额': previous_turnover,
-                            '增长比例': growth_ratio,
-                            '最近交易日': recent_record['date'].strftime('%Y-%m-%d'),
-                            '前一交易日': previous_record['date'].strftime('%Y-%m-%d')
-                        })
-                        
-                        if (idx + 1) % 10 == 0:
-                            print(f"已分析 {idx + 1}/{len(high_volume_stocks)} 支股票")
-                
-        except Exception as e:
-            print(f"分析股票 {code} {name} 时出错: {e}")
-            continue
+            if (idx + 1) % 10 == 0:
+                print(f"已分析 {idx + 1}/{len(high_volume_stocks)} 支股票")
     
     print(f"已分析 {len(high_volume_stocks)}/{len(high_volume_stocks)} 支股票")
     
-    # 转换为DataFrame并分类
     if not analysis_results:
         print("没有获取到有效的分析结果")
-        return {'50%': pd.DataFrame(), '100%': pd.DataFrame(), '200%': pd.DataFrame()}
+        return pd.DataFrame()
     
     analysis_df = pd.DataFrame(analysis_results)
-    analysis_df = analysis_df.sort_values(by='增长比例', ascending=False)
+    save_prior_growth(analysis_df)
+    return analysis_df.sort_values(by='增长比例', ascending=False).reset_index(drop=True)
+
+def classify_growth(analysis_df, thresholds=None):
+    """按增长比例阈值对完整分析表分档"""
+    thresholds = thresholds or GROWTH_THRESHOLDS
+    if analysis_df.empty:
+        return {label: pd.DataFrame() for label in thresholds}
+    
+    return {
+        label: analysis_df[analysis_df['增长比例'] > ratio].copy()
+        for label, ratio in thresholds.items()
+    }
+
+def analyze_volume_growth(high_volume_stocks):
+    """
+    第二阶段：对筛选后的股票进行历史数据分析
+    改为比较前两个完整交易日的成交额
+    """
+    analysis_df = compute_turnover_growth(high_volume_stocks)
+    if analysis_df.empty:
+        return empty_growth_results()
     
     # 按不同增长比例分类
-    result_50 = analysis_df[analysis_df['增长比例'] > 1.5].copy()  # 增长50%以上
-    result_100 = analysis_df[analysis_df['增长比例'] > 2.0].copy()  # 增长100%以上
-    result_200 = analysis_df[analysis_df['增长比例'] > 3.0].copy()  # 增长200%以上
+    results = classify_growth(analysis_df)
     
     print(f"分析完成！")
-    print(f"成交额增长 > 50%: {len(result_50)} 支")
-    print(f"成交额增长 > 100%: {len(result_100)} 支") 
-    print(f"成交额增长 > 200%: {len(result_200)} 支")
+    print(f"成交额增长 > 50%: {len(results['50%'])} 支")
+    print(f"成交额增长 > 100%: {len(results['100%'])} 支") 
+    print(f"成交额增长 > 200%: {len(results['200%'])} 支")
     
-    return {
-        '50%': result_50,
-        '100%': result_100,
-        '200%': result_200
-    }
+    return results
 
 def save_results(results):
     """保存结果到CSV文件"""
@@ -1,10 +1,20 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import datetime
+import os
+import threading
 import time
+import weakref
 import plotly.express as px
 import plotly.graph_objects as go
-from hk_volume_filter import get_high_volume_stocks, analyze_volume_growth
+from hk_volume_filter import (
+    get_high_volume_stocks, compute_turnover_growth, update_turnover_growth, classify_growth, GROWTH_THRESHOLDS
+)
+from hk_fetch_scheduler import FetchScheduler
+from hk_resample import compute_period_growth
+from hk_history import history_store
+from hk_export import EXPORT_FORMATS, ExportError, export_to_tempfile, iter_frame_chunks, iter_history_chunks
 
 # 设置页面配置
 st.set_page_config(
@@ -93,6 +103,370 @@ def create_growth_ratio_chart(df, title):
     
     return fig
 
+def downsample_scatter(df, max_points=2000, grid=(80, 60)):
+    """
+    服务端降采样：点数超过 max_points 时，把 对数成交额×对数增长比例 平面划分为网格，
+    从最稀疏的网格开始保留单点，直到用完点数预算；其余含多个点的网格各聚合为一个点
+    （只有一个点的网格不聚合，因此单点数可能略超预算）
+    返回 (单点DataFrame, 聚合DataFrame)
+    """
+    data = df[['代码', '名称', '最近交易日成交额', '增长比例']].copy()
+    data = data[(data['最近交易日成交额'] > 0) & (data['增长比例'] > 0)]
+    if len(data) <= max_points:
+        return data, pd.DataFrame(columns=['x', 'y', 'count', 'mean_ratio'])
+    
+    log_x = np.log10(data['最近交易日成交额'].to_numpy())
+    log_y = np.log10(data['增长比例'].to_numpy())
+    bin_x = np.minimum(((log_x - log_x.min()) / (np.ptp(log_x) or 1) * grid[0]).astype(int), grid[0] - 1)
+    bin_y = np.minimum(((log_y - log_y.min()) / (np.ptp(log_y) or 1) * grid[1]).astype(int), grid[1] - 1)
+    data['bin'] = bin_x * grid[1] + bin_y
+    data['log_x'] = log_x
+    data['log_y'] = log_y
+    
+    counts = data['bin'].value_counts().sort_values(kind='stable')
+    # 只聚合包含多个点的网格，单点网格始终保留原始股票
+    keep_bins = counts.index[(counts.cumsum() <= max_points) | (counts == 1)]
+    single = data['bin'].isin(keep_bins)
+    
+    clusters = data[~single].groupby('bin').agg(
+        x=('log_x', 'mean'), y=('log_y', 'mean'), count=('代码', 'size'), mean_ratio=('增长比例', 'mean')
+    )
+    clusters['x'] = 10 ** clusters['x']
+    clusters['y'] = 10 ** clusters['y']
+    return data.loc[single, ['代码', '名称', '最近交易日成交额', '增长比例']], clusters.reset_index(drop=True)
+
+def create_growth_scatter_chart(df, title, max_points=2000):
+    """
+    全部已分析股票的成交额-增长比例散点图
+    使用WebGL(Scattergl)渲染；数值四舍五入、悬停文字由 hovertemplate 在浏览器端格式化，控制传输体积
+    """
+    if df.empty:
+        return None
+    
+    points, clusters = downsample_scatter(df, max_points=max_points)
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scattergl(
+        name='股票',
+        x=points['最近交易日成交额'].round(-3),
+        y=points['增长比例'].round(3),
+        customdata=np.column_stack([points['代码'], points['名称']]),
+        mode='markers',
+        marker=dict(size=5, color='orange', opacity=0.7),
+        hovertemplate='%{customdata[0]} %{customdata[1]}<br>成交额: %{x:.3s}<br>增长比例: %{y:.2f}<extra></extra>',
+    ))
+    
+    if not clusters.empty:
+        fig.add_trace(go.Scattergl(
+            name='密集区域(聚合)',
+            x=clusters['x'].round(-3),
+            y=clusters['y'].round(3),
+            customdata=np.column_stack([clusters['count'], clusters['mean_ratio'].round(3)]),
+            mode='markers',
+            marker=dict(
+                size=np.clip(np.sqrt(clusters['count']) * 3, 6, 30).round(1),
+                color='steelblue',
+                opacity=0.5,
+            ),
+            hovertemplate='聚合 %{customdata[0]} 支<br>平均增长比例: %{customdata[1]:.2f}<extra></extra>',
+        ))
+    
+    # 各档增长阈值参考线
+    # 对数坐标轴上注释的 y 需使用 log10 值，因此单独添加标注
+    for label, ratio in GROWTH_THRESHOLDS.items():
+        fig.add_hline(y=ratio, line_dash='dot', line_color='red', opacity=0.4)
+        fig.add_annotation(x=0, xref='paper', y=np.log10(ratio), yref='y', text=f'增长{label}',
+                           showarrow=False, xanchor='left', yanchor='bottom', font=dict(color='red'))
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title='最近交易日成交额(港元)',
+        yaxis_title='增长比例',
+        xaxis_type='log',
+        yaxis_type='log',
+        height=600,
+        uirevision='growth-scatter',
+    )
+    
+    return fig
+
+# ============ 数据导出 ============
+
+EXPORT_SCOPES = {
+    '筛选结果(增长>50%)': lambda data: iter_frame_chunks(data['results']),
+    '全部已分析股票': lambda data: iter_frame_chunks(data['analysis']),
+    '历史窗口(日线)': lambda data: iter_history_chunks(history_store, data['codes']),
+}
+
+class ExportFile:
+    """
+    会话生成的导出临时文件
+    下载后、重新生成或切换导出内容时删除；会话结束（会话状态被回收）或进程退出时兜底删除
+    """
+    
+    def __init__(self, path, scope, fmt, file_name):
+        self.path = path
+        self.scope = scope
+        self.fmt = fmt
+        self.file_name = file_name
+        self._finalizer = weakref.finalize(self, _remove_file, path)
+    
+    def remove(self):
+        self._finalizer()
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _discard_export_file():
+    """下载按钮回调：文件只提供一次下载，随后删除"""
+    export_file = st.session_state.pop('export_file', None)
+    if export_file is not None:
+        export_file.remove()
+
+def render_export_panel():
+    """
+    侧边栏导出面板：点击生成时才按块写入临时文件，普通页面重跑不做任何导出工作
+    下载按钮会把整个文件读入 Streamlit 内存媒体存储，每次导出占用一份文件大小的内存，下载后即释放
+    """
+    export_data = st.session_state.get('export_data')
+    if not export_data:
+        return
+    
+    st.sidebar.markdown("---")
+    st.sidebar.header("💾 数据导出")
+    scope = st.sidebar.selectbox("导出内容", list(EXPORT_SCOPES))
+    fmt = st.sidebar.selectbox("文件格式", list(EXPORT_FORMATS))
+    
+    export_file = st.session_state.get('export_file')
+    if export_file is not None and (export_file.scope != scope or export_file.fmt != fmt):
+        # 已切换导出内容或格式，旧文件不再提供下载
+        _discard_export_file()
+    
+    if st.sidebar.button("生成导出文件"):
+        _discard_export_file()
+        try:
+            with st.spinner("正在生成导出文件..."):
+                path = export_to_tempfile(EXPORT_SCOPES[scope](export_data), fmt)
+            st.session_state['export_file'] = ExportFile(
+                path, scope, fmt,
+                f"港股成交额{scope}_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}{EXPORT_FORMATS[fmt][1]}"
+            )
+        except ExportError as e:
+            st.sidebar.error(f"❌ {e}")
+    
+    export_file = st.session_state.get('export_file')
+    if export_file is not None:
+        if not os.path.exists(export_file.path):
+            _discard_export_file()
+            return
+        with open(export_file.path, 'rb') as f:
+            st.sidebar.download_button(
+                label=f"📥 下载 {export_file.file_name}",
+                data=f,
+                file_name=export_file.file_name,
+                mime=EXPORT_FORMATS[fmt][0],
+                on_click=_discard_export_file
+            )
+
+# ============ 实时模式 ============
+
+class LiveDataSource:
+    """
+    所有会话共享的实时数据源
+    数据过期时在后台线程中增量更新，完成后整体替换；读取方从不等待更新完成。
+    首次更新前可用最近一次完整分析结果作为初始数据（seed）
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.analysis_df = pd.DataFrame()
+        self.updated_at = None
+        self.refreshing = False
+        self.progress = None  # (已抓取, 待抓取) 首次抓取历史数据时的进度
+    
+    def seed(self, analysis_df):
+        """用完整分析结果作为初始数据，不覆盖已有的实时数据"""
+        with self._lock:
+            if self.updated_at is None and not analysis_df.empty:
+                self.analysis_df = analysis_df
+                self.updated_at = time.time()
+    
+    def get(self, max_age):
+        """返回当前数据，过期时触发后台更新"""
+        with self._lock:
+            stale = self.updated_at is None or time.time() - self.updated_at >= max_age
+            if stale and not self.refreshing:
+                self.refreshing = True
+                threading.Thread(target=self._refresh, daemon=True).start()
+            return self.analysis_df, self.updated_at
+    
+    def _refresh(self):
+        def on_progress(done, total):
+            self.progress = (done, total)
+        
+        try:
+            spot = get_high_volume_stocks()
+            analysis_df = update_turnover_growth(spot, on_progress=on_progress) if not spot.empty else pd.DataFrame()
+            with self._lock:
+                if not analysis_df.empty:
+                    self.analysis_df = analysis_df
+                self.updated_at = time.time()
+        except Exception as e:
+            print(f"实时数据更新出错: {e}")
+        finally:
+            self.refreshing = False
+            self.progress = None
+
+@st.cache_resource
+def get_live_source():
+    return LiveDataSource()
+
+def content_hash(df, columns=None):
+    """组件数据内容哈希，用于判断是否需要重新渲染"""
+    if df.empty:
+        return 'empty'
+    data = df[columns] if columns else df
+    return format(int(pd.util.hash_pandas_object(data, index=False).sum()) & 0xFFFFFFFFFFFFFFFF, 'x')
+
+def cached_component(name, digest, build):
+    """内容哈希未变化时复用上一次构建的图表/表格，避免重复构建"""
+    cache = st.session_state.setdefault('live_components', {})
+    entry = cache.get(name)
+    if entry is None or entry[0] != digest:
+        entry = cache[name] = (digest, build())
+    return entry[1]
+
+def highlight_changes(table, previous):
+    """新出现的股票标绿，增长比例变化的股票标黄；没有对比基准时不标记"""
+    styler = table.style.format({
+        '最近交易日成交额': format_number,
+        '前一交易日成交额': format_number,
+        '增长比例': '{:.2f}',
+    })
+    if previous.empty:
+        return styler
+    previous_ratio = previous.set_index('代码')['增长比例']
+    
+    def style_row(row):
+        if row['代码'] not in previous_ratio.index:
+            return ['background-color: #d4f7d4'] * len(row)
+        if abs(previous_ratio[row['代码']] - row['增长比例']) > 1e-9:
+            return ['background-color: #fff3b0'] * len(row)
+        return [''] * len(row)
+    
+    return styler.apply(style_row, axis=1)
+
+def live_view(refresh_seconds, period='日', include_current=False):
+    """
+    读取共享数据并按统计周期汇总，返回 (数据源, 分析表, 更新时间, 内容哈希)
+    内容哈希覆盖页面上显示的全部数据，首次加载期间为加载进度
+    """
+    source = get_live_source()
+    analysis_df, updated_at = source.get(refresh_seconds)
+    if updated_at is None:
+        return source, analysis_df, updated_at, f'loading-{source.progress}'
+    
+    # 周/月增长：由共享的日线窗口汇总（不含盘中实时数据）
+    if period != '日' and not analysis_df.empty:
+        names = dict(zip(analysis_df['代码'], analysis_df['名称']))
+        analysis_df = compute_period_growth({'周': 'W', '月': 'M'}[period], names, include_current)
+    
+    digest = content_hash(analysis_df, ['代码', '名称', '最近交易日成交额', '前一交易日成交额', '增长比例'])
+    return source, analysis_df, updated_at, digest
+
+def render_live_dashboard(refresh_seconds, period='日', include_current=False):
+    """实时模式页面：只重建内容发生变化的组件；period 为周/月时按周期汇总"""
+    source, analysis_df, updated_at, digest = live_view(refresh_seconds, period, include_current)
+    st.session_state['live_shown'] = digest
+    
+    if updated_at is None:
+        # 首次更新需为所有股票抓取历史数据，耗时较长，显示进度而不阻塞页面
+        progress = source.progress
+        if progress:
+            st.info(f"⏳ 正在首次加载历史数据：{progress[0]}/{progress[1]}，加载完成后自动显示")
+        else:
+            st.info("⏳ 正在获取实时行情，加载完成后自动显示")
+        return
+    
+    results = classify_growth(analysis_df)
+    st.caption(
+        f"🔴 实时模式：每 {refresh_seconds} 秒检查一次，数据有变化时才重新发送页面；当前数据更新于 "
+        f"{datetime.datetime.fromtimestamp(updated_at).strftime('%H:%M:%S')}"
+    )
+    if analysis_df.empty:
+        st.info("暂无数据")
+        return
+    if period != '日':
+        st.caption(
+            f"📅 按{period}统计：{analysis_df['最近交易日'].iloc[0]} 对比 "
+            f"{analysis_df['前一交易日'].iloc[0]}（表中\"交易日\"列为周期）"
+        )
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("已分析股票", len(analysis_df))
+    col2.metric("增长>50%", len(results['50%']))
+    col3.metric("增长>100%", len(results['100%']))
+    col4.metric("增长>200%", len(results['200%']))
+    
+    top15 = analysis_df.head(15)
+    fig_growth = cached_component(
+        'growth', content_hash(top15, ['代码', '增长比例']),
+        lambda: create_growth_ratio_chart(top15, "港股成交额增长率TOP15")
+    )
+    top10 = analysis_df.head(10)
+    fig_turnover = cached_component(
+        'turnover', content_hash(top10, ['代码', '最近交易日成交额', '前一交易日成交额']),
+        lambda: create_turnover_chart(top10, "成交额前后对比TOP10")
+    )
+    fig_scatter = cached_component(
+        'scatter', content_hash(analysis_df, ['代码', '最近交易日成交额', '增长比例']),
+        lambda: create_growth_scatter_chart(analysis_df, f"全市场成交额与增长比例分布（{len(analysis_df)}支）")
+    )
+    
+    # 数据变化时，把上一版数据作为对比基准，用于标记新增/变化的股票
+    data_digest = content_hash(analysis_df, ['代码', '增长比例'])
+    if st.session_state.get('live_digest') != data_digest:
+        st.session_state['live_baseline'] = st.session_state.get('live_current', pd.DataFrame())
+        st.session_state['live_current'] = analysis_df[['代码', '增长比例']]
+        st.session_state['live_digest'] = data_digest
+    
+    table = results['50%'][['代码', '名称', '最近交易日成交额', '前一交易日成交额', '增长比例']]
+    styled = cached_component(
+        'table', data_digest,
+        lambda: highlight_changes(table, st.session_state['live_baseline'])
+    )
+    
+    tab1, tab2, tab3, tab4 = st.tabs(["📈 增长率图表", "💰 成交额对比", "🌐 全市场分布", "📋 增长>50%"])
+    with tab1:
+        st.plotly_chart(fig_growth, use_container_width=True, key='live_growth')
+    with tab2:
+        st.plotly_chart(fig_turnover, use_container_width=True, key='live_turnover')
+    with tab3:
+        st.plotly_chart(fig_scatter, use_container_width=True, key='live_scatter')
+    with tab4:
+        st.caption("🟩 新进入  🟨 增长比例有变化")
+        st.dataframe(styled, use_container_width=True)
+
+def watch_live_data(refresh_seconds, period, include_current):
+    """
+    定时检查共享数据（同时触发过期数据的后台更新），本身不输出任何元素。
+    内容哈希与页面上显示的一致时什么也不发送；有变化时整页重跑一次
+    """
+    _, _, _, digest = live_view(refresh_seconds, period, include_current)
+    if digest != st.session_state.get('live_shown'):
+        st.rerun()
+
+def run_live_dashboard(refresh_seconds, period='日', include_current=False):
+    """
+    按间隔自动刷新：页面只在整页运行时渲染，定时器片段每次只做一次内容比较，
+    数据未变化时图表不会被重新序列化和发送
+    """
+    render_live_dashboard(refresh_seconds, period, include_current)
+    st.fragment(run_every=refresh_seconds)(watch_live_data)(refresh_seconds, period, include_current)
+
 def main():
     """主应用函数"""
     st.title("📈 港股成交量筛选分析系统")
@@ -116,8 +490,38 @@ def main():
         step=0.1
     )
     
+    fast_mode = st.sidebar.checkbox(
+        "⚡ 快速模式(近似TOP N)",
+        value=False,
+        help="按相关性优先抓取，跳过估计进不了TOP N的股票，超出时间预算后提前结束；结果为近似排名"
+    )
+    if fast_mode:
+        top_n = st.sidebar.number_input("TOP N", min_value=5, max_value=100, value=15, step=5)
+        time_budget = st.sidebar.slider("时间预算(秒)", min_value=10, max_value=300, value=60, step=10)
+    
+    period = st.sidebar.radio(
+        "统计周期",
+        options=['日', '周', '月'],
+        horizontal=True,
+        help="周/月增长由已抓取的日线数据汇总，不额外请求数据"
+    )
+    include_current = False
+    if period != '日':
+        include_current = st.sidebar.checkbox("包含当前未完成周期", value=False)
+    
+    live_mode = st.sidebar.checkbox(
+        "🔴 实时模式",
+        value=False,
+        help="按固定间隔自动刷新，数据在所有用户间共享并增量更新"
+    )
+    if live_mode:
+        refresh_seconds = st.sidebar.slider("刷新间隔(秒)", min_value=30, max_value=600, value=60, step=30)
+    
+    if live_mode:
+        run_live_dashboard(refresh_seconds, period, include_current)
+    
     # 运行分析按钮
-    if st.sidebar.button("🚀 开始分析", type="primary"):
+    elif st.sidebar.button("🚀 开始分析", type="primary"):
         
         # 显示进度
         progress_bar = st.progress(0)
@@ -148,7 +552,40 @@ def main():
                 st.metric("平均成交额", format_number(avg_turnover))
             
             # 分析增长情况
-            results = analyze_volume_growth(high_volume_stocks)
+            if fast_mode:
+                scheduler = FetchScheduler(high_volume_stocks)
+                
+                def on_result(result, count, total):
+                    progress_bar.progress(50 + int(25 * count / total))
+                    status_text.text(f"第二阶段：已分析 {count} 支，当前 {result['代码']} {result['名称']}")
+                
+                analysis_df = scheduler.run(top_n=int(top_n), time_budget=time_budget, on_result=on_result)
+                results = classify_growth(analysis_df)
+                stats = scheduler.stats
+                st.caption(
+                    f"⚡ 快速模式：抓取 {stats['fetched']}/{stats['total']} 支，"
+                    f"跳过 {stats['skipped']} 支，耗时 {stats['elapsed']:.1f} 秒；"
+                    f"TOP{int(top_n)}为近似排名，各档数量可能偏少"
+                )
+            else:
+                analysis_df = compute_turnover_growth(high_volume_stocks)
+                results = classify_growth(analysis_df)
+            
+            # 完整分析结果作为实时模式首次更新完成前的初始数据
+            if not fast_mode:
+                get_live_source().seed(analysis_df)
+            
+            # 周/月增长：由刚抓取的日线窗口汇总
+            if period != '日' and not analysis_df.empty:
+                freq = {'周': 'W', '月': 'M'}[period]
+                names = dict(zip(analysis_df['代码'], analysis_df['名称']))
+                analysis_df = compute_period_growth(freq, names, include_current)
+                results = classify_growth(analysis_df)
+                if not analysis_df.empty:
+                    st.caption(
+                        f"📅 按{period}统计：{analysis_df['最近交易日'].iloc[0]} 对比 "
+                        f"{analysis_df['前一交易日'].iloc[0]}（表中\"交易日\"列为周期）"
+                    )
             progress_bar.progress(75)
             
             # 合并所有结果
@@ -156,6 +593,13 @@ def main():
                 results['50%'], results['100%'], results['200%']
             ]).drop_duplicates().sort_values('增长比例', ascending=False)
             
+            # 供侧边栏导出面板使用，导出文件只在请求时生成
+            st.session_state['export_data'] = {
+                'results': all_results,
+                'analysis': analysis_df,
+                'codes': high_volume_stocks['代码'].tolist(),
+            }
+            
             progress_bar.progress(100)
             status_text.text("✅ 分析完成!")
             
@@ -189,7 +633,7 @@ def main():
                 )
             
             # 创建标签页
-            tab1, tab2, tab3, tab4 = st.tabs(["📈 增长率图表", "💰 成交额对比", "📋 详细数据", "💾 数据下载"])
+            tab1, tab2, tab5, tab3, tab4 = st.tabs(["📈 增长率图表", "💰 成交额对比", "🌐 全市场分布", "📋 详细数据", "💾 数据下载"])
             
             with tab1:
                 st.markdown("### 成交额增长率排行")
@@ -207,6 +651,14 @@ def main():
                 else:
                     st.info("没有符合条件的数据")
             
+            with tab5:
+                st.markdown("### 成交额 vs 增长比例（全部已分析股票）")
+                if not analysis_df.empty:
+                    fig_scatter = create_growth_scatter_chart(analysis_df, f"全市场成交额与增长比例分布（{len(analysis_df)}支）")
+                    st.plotly_chart(fig_scatter, use_container_width=True)
+                else:
+                    st.info("没有可显示的数据")
+            
             with tab3:
                 st.markdown("### 详细数据表")
                 
@@ -235,13 +687,7 @@ def main():
             with tab4:
                 st.markdown("### 数据导出")
                 if not all_results.empty:
-                    csv = all_results.to_csv(index=False, encoding='utf-8-sig')
-                    st.download_button(
-                        label="📥 下载完整分析结果 (CSV)",
-                        data=csv,
-                        file_name=f"港股成交额分析_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                        mime='text/csv'
-                    )
+                    st.info("👈 在左侧「数据导出」中选择内容和格式，点击生成后下载")
                     
                     # 显示样本数据
                     st.markdown("#### 数据预览")
@@ -273,6 +719,8 @@ def main():
         - 可根据市场情况调整参数
         - 结果仅供参考，投资需谨慎
         """)
+    
+    render_export_panel()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
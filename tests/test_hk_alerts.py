@@ -0,0 +1,128 @@
+"""hk_alerts：规则编译、向量化评估及提醒去重"""
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from hk_alerts import AlertEngine, CompiledRules, load_rules, prepare_snapshot
+
+
+class ListSink:
+    def __init__(self):
+        self.alerts = []
+
+    def emit(self, alerts):
+        self.alerts.extend(alerts)
+
+
+def snapshot(rows):
+    return pd.DataFrame(rows, columns=['代码', '名称', '最近交易日成交额', '前一交易日成交额', '增长比例', '前10日平均成交额'])
+
+
+def frame(ratios):
+    return pd.DataFrame({'增长比例': ratios}, index=[f'{i:05d}' for i in range(len(ratios))])
+
+
+def test_compile_rejects_unknown_field_operator_and_empty_rule():
+    with pytest.raises(ValueError, match='未知字段'):
+        CompiledRules([{'conditions': [['spot_turnover', '>', 1]]}])
+    with pytest.raises(ValueError, match='运算符'):
+        CompiledRules([{'conditions': [['增长比例', '==', 1]]}])
+    with pytest.raises(ValueError, match='没有任何条件'):
+        CompiledRules([{'name': '空规则', 'conditions': []}])
+
+
+def test_alias_maps_to_field():
+    rules = CompiledRules([{'conditions': [['growth', '>', 2]]}])
+    assert rules.fields == ['增长比例']
+    assert rules.names == ['规则1']
+
+
+def test_repeated_conditions_keep_tightest_bound():
+    rules = CompiledRules([
+        {'conditions': [['增长比例', '>', 2.5], ['增长比例', '>', 1.0]]},
+        {'conditions': [['增长比例', '<', 1.0], ['增长比例', '<', 5.0]]},
+        {'conditions': [['增长比例', '>=', 1.0], ['增长比例', '<=', 2.0]]},
+    ])
+    fired = rules.evaluate(frame([2.0, 3.0, 0.5, 1.0]))
+    assert fired.tolist() == [
+        [False, False, True],
+        [True, False, False],
+        [False, True, False],
+        [False, False, True],
+    ]
+
+
+def test_missing_field_never_fires():
+    rules = CompiledRules([{'conditions': [['均额倍数', '>', 1]]}, {'conditions': [['增长比例', '>', 1]]}])
+    assert rules.evaluate(frame([2.0])).tolist() == [[False, True]]
+
+
+def test_code_scoping_including_empty_watchlist():
+    rules = CompiledRules([
+        {'codes': 'watchlist', 'conditions': [['增长比例', '>', 1]]},
+        {'codes': [1], 'conditions': [['增长比例', '>', 1]]},
+        {'codes': [], 'conditions': [['增长比例', '>', 1]]},
+        {'conditions': [['增长比例', '>', 1]]},
+    ], watchlist=[])
+    fired = rules.evaluate(frame([2.0, 2.0]))
+    assert fired.tolist() == [
+        [False, False, False, True],
+        [False, True, False, True],
+    ]
+
+
+def test_prepare_snapshot_derives_average_multiple():
+    df = prepare_snapshot(snapshot([
+        ['00700', '腾讯控股', 3e8, 1e8, 3.0, 1e8],
+        ['09988', '阿里巴巴', 1e8, 1e8, 1.0, 0.0],
+    ]))
+    assert df.loc['00700', '均额倍数'] == 3.0
+    assert pd.isna(df.loc['09988', '均额倍数'])
+
+
+def test_engine_dedupes_until_condition_clears():
+    sink = ListSink()
+    engine = AlertEngine([{'name': '放量', 'conditions': [['增长比例', '>', 2]]}], sinks=[sink])
+    first = snapshot([['00700', '腾讯控股', 3e8, 1e8, 3.0, 1e8], ['09988', '阿里巴巴', 1e8, 1e8, 1.0, 1e8]])
+
+    alerts = engine.evaluate(first)
+    assert [(a['rule'], a['code'], a['name']) for a in alerts] == [('放量', '00700', '腾讯控股')]
+    assert alerts[0]['values']['增长比例'] == 3.0
+    assert sink.alerts == alerts
+
+    # 数据未变化或仍满足条件时不重复提醒
+    assert engine.evaluate(first) == []
+    assert engine.evaluate(snapshot([['00700', '腾讯控股', 4e8, 1e8, 4.0, 1e8]])) == []
+
+    # 条件解除后再次满足时重新提醒
+    assert engine.evaluate(snapshot([['00700', '腾讯控股', 1e8, 1e8, 1.0, 1e8]])) == []
+    again = engine.evaluate(snapshot([['00700', '腾讯控股', 3e8, 1e8, 3.0, 1e8]]))
+    assert [a['code'] for a in again] == ['00700']
+
+
+def test_engine_sink_failure_does_not_raise():
+    class BrokenSink:
+        def emit(self, alerts):
+            raise OSError('unreachable')
+
+    engine = AlertEngine([{'conditions': [['增长比例', '>', 2]]}], sinks=[BrokenSink()])
+    alerts = engine.evaluate(snapshot([['00700', '腾讯控股', 3e8, 1e8, 3.0, 1e8]]))
+    assert len(alerts) == 1
+
+
+def test_load_rules_accepts_list_or_object(tmp_path):
+    path = tmp_path / 'rules.json'
+    path.write_text(json.dumps({'watchlist': ['700'], 'rules': [{'conditions': [['增长比例', '>', 2]]}]}), encoding='utf-8')
+    rules, watchlist = load_rules(path)
+    assert watchlist == ['700'] and len(rules) == 1
+
+    path.write_text(json.dumps([{'conditions': [['增长比例', '>', 2]]}]), encoding='utf-8')
+    assert load_rules(path) == ([{'conditions': [['增长比例', '>', 2]]}], [])
+
+
+def test_example_rules_compile():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alert_rules.example.json')
+    rules, watchlist = load_rules(path)
+    assert len(CompiledRules(rules, watchlist)) == len(rules)
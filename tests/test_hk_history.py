@@ -0,0 +1,103 @@
+"""hk_history：环形缓冲区及尾部窗口截取"""
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from hk_history import HistoryRingBuffer, HistoryStore, _tail_window
+
+
+def day_range(start, periods):
+    return np.arange(np.datetime64(start), np.datetime64(start) + periods, dtype='datetime64[D]')
+
+
+def daily_frame(dates, volume=None):
+    dates = pd.DatetimeIndex(dates)
+    volume = np.arange(1, len(dates) + 1, dtype=float) if volume is None else volume
+    return pd.DataFrame({'date': dates.strftime('%Y-%m-%d'), 'volume': volume, 'close': 2.0})
+
+
+def test_ring_buffer_wraparound_keeps_latest_in_order():
+    buffer = HistoryRingBuffer(size=5)
+    dates = day_range('2026-10-01', 8)
+    assert buffer.extend(dates[:3], [1, 2, 3], [1, 1, 1]) == 3
+    assert buffer.extend(dates[3:], [4, 5, 6, 7, 8], [1, 1, 1, 1, 1]) == 5
+
+    tail_dates, volume, _ = buffer.tail()
+    assert len(buffer) == 5
+    assert list(tail_dates) == list(dates[3:])
+    assert list(volume) == [4, 5, 6, 7, 8]
+    assert buffer.last_date == dates[-1]
+    assert list(buffer.tail(2)[1]) == [7, 8]
+
+
+def test_ring_buffer_extend_longer_than_size():
+    buffer = HistoryRingBuffer(size=4)
+    buffer.extend(day_range('2026-10-01', 2), [1, 2], [1, 1])
+    dates = day_range('2026-10-03', 10)
+    assert buffer.extend(dates, np.arange(10), np.ones(10)) == 10
+    assert list(buffer.tail()[0]) == list(dates[-4:])
+    assert list(buffer.tail()[1]) == [6, 7, 8, 9]
+
+
+def test_ring_buffer_same_day_overwrite_and_older_ignored():
+    buffer = HistoryRingBuffer(size=5)
+    dates = day_range('2026-10-01', 3)
+    buffer.extend(dates, [1, 2, 3], [10, 10, 10])
+
+    # 同日数据覆盖，早于最后一条的数据忽略
+    assert buffer.extend([dates[0], dates[2]], [100, 30], [99, 11]) == 0
+    _, volume, close = buffer.tail()
+    assert list(volume) == [1, 2, 30]
+    assert list(close) == [10, 10, 11]
+
+    dates_turnover, turnover = buffer.turnover(1)
+    assert dates_turnover[0] == dates[2]
+    assert turnover[0] == 330
+
+
+def test_tail_window_ascending():
+    window = _tail_window(daily_frame(pd.bdate_range('2026-09-01', periods=10)), 3)
+    assert list(window['volume']) == [8, 9, 10]
+    assert window['date'].is_monotonic_increasing
+
+
+def test_tail_window_descending_input():
+    dates = pd.bdate_range('2026-09-01', periods=10)
+    frame = daily_frame(dates)[::-1].reset_index(drop=True)
+    window = _tail_window(frame, 3)
+    assert list(window['volume']) == [8, 9, 10]
+    assert list(window['date']) == list(dates[-3:].values.astype('datetime64[D]'))
+
+
+def test_tail_window_unsorted_input():
+    dates = pd.bdate_range('2026-09-01', periods=6)
+    frame = daily_frame(dates).iloc[[2, 0, 5, 1, 4, 3]]
+    window = _tail_window(frame, 4)
+    assert list(window['volume']) == [3, 4, 5, 6]
+    assert window['date'].is_monotonic_increasing
+
+
+def test_store_ingest_keeps_window_and_records_fetch_date():
+    store = HistoryStore(window=5)
+    dates = pd.bdate_range('2026-09-01', periods=20)
+    buffer = store.ingest('00700', daily_frame(dates))
+
+    assert len(buffer) == 5
+    assert buffer.last_date == np.datetime64(dates[-1].date())
+    assert store.fetched_on('00700') == datetime.date.today()
+    assert store.fetched_on('09988') is None
+
+    # 空数据不清除已有缓冲区
+    assert store.ingest('00700', daily_frame([])) is buffer
+    assert store.ingest('09988', daily_frame([])) is None
+    assert '09988' not in store
+
+
+def test_store_ingest_appends_new_days():
+    store = HistoryStore(window=5)
+    dates = pd.bdate_range('2026-09-01', periods=8)
+    store.ingest('00700', daily_frame(dates[:6]))
+    buffer = store.ingest('00700', daily_frame(dates))
+    assert list(buffer.tail()[1]) == [4, 5, 6, 7, 8]
+    assert buffer.last_date == np.datetime64(dates[-1].date())
@@ -0,0 +1,134 @@
+"""hk_resample：周/月成交额增量汇总"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from hk_history import HistoryStore
+from hk_resample import PeriodTurnover, PeriodTurnoverTable, period_keys, period_label
+
+# 2026-09-30（周三）起：截断的第40周3天、第41周、第42周各5天、第43周（当前周）1天
+DATES = pd.bdate_range('2026-09-30', '2026-10-19')
+TURNOVER = np.array([1.0] * 3 + [2.0] * 5 + [3.0] * 5 + [4.0])
+
+
+def daily_frame(dates, volume):
+    return pd.DataFrame({'date': pd.DatetimeIndex(dates).strftime('%Y-%m-%d'), 'volume': volume, 'close': 1.0})
+
+
+def as_days(dates):
+    return pd.DatetimeIndex(dates).values.astype('datetime64[D]')
+
+
+def test_period_keys_and_labels():
+    keys = period_keys(as_days(['2026-10-05', '2026-10-09', '2026-10-12']), 'W')
+    assert list(keys) == list(as_days(['2026-10-05', '2026-10-05', '2026-10-12']))
+    assert period_label(keys[-1], 'W') == '2026-W42'
+
+    month = period_keys(as_days(['2026-10-31']), 'M')[0]
+    assert period_label(month, 'M') == '2026-10'
+
+    with pytest.raises(ValueError):
+        period_keys(as_days(['2026-10-05']), 'Q')
+
+
+def test_weekly_sums_exclude_head_and_current_period():
+    series = PeriodTurnover('W')
+    assert series.update(as_days(DATES), TURNOVER) == len(DATES)
+
+    recent, previous = series.comparable()
+    assert (recent[1], recent[2]) == (15.0, 5)
+    assert (previous[1], previous[2]) == (10.0, 5)
+
+    recent, previous = series.comparable(include_current=True)
+    assert recent[1] == 4.0 and previous[1] == 15.0
+
+
+def test_truncated_head_period_is_not_compared():
+    series = PeriodTurnover('W')
+    series.update(as_days(DATES[:9]), TURNOVER[:9])
+    # 完整周只有第41周，截断的第40周不参与比较
+    assert series.comparable() is None
+    recent, previous = series.comparable(include_current=True)
+    assert recent[1] == 3.0 and previous[1] == 10.0
+
+
+def test_same_day_update_corrects_current_period_by_delta():
+    series = PeriodTurnover('W')
+    series.update(as_days(DATES), TURNOVER)
+
+    assert series.update(as_days(['2026-10-19']), [7.0]) == 0
+    assert series.periods[-1][1] == 7.0
+    # 早于最后一条的数据忽略，同日数据再次修正
+    series.update(as_days(['2026-10-16', '2026-10-19']), [100.0, 8.0])
+    assert series.periods[-1][1] == 8.0
+    assert series.periods[-2][1] == 15.0
+
+    series.update(as_days(['2026-10-19', '2026-10-20']), [8.0, 5.0])
+    assert series.periods[-1][1] == 13.0
+    assert series.periods[-1][2] == 2
+
+
+def test_table_growth_uses_daily_store():
+    store = HistoryStore()
+    store.ingest('00700', daily_frame(DATES, TURNOVER))
+    store.ingest('09988', daily_frame(DATES, TURNOVER * 2))
+    table = PeriodTurnoverTable('W', store)
+
+    growth = table.growth_table({'00700': '腾讯控股'})
+    assert list(growth['代码']) == ['00700']
+    row = growth.iloc[0]
+    assert row['名称'] == '腾讯控股'
+    assert row['增长比例'] == pytest.approx(1.5)
+    assert (row['最近交易日'], row['前一交易日']) == ('2026-W42', '2026-W41')
+
+
+def test_sync_picks_up_day_ingested_by_refresh():
+    store = HistoryStore()
+    store.ingest('00700', daily_frame(DATES[:-1], TURNOVER[:-1]))
+    table = PeriodTurnoverTable('W', store)
+    table.sync()
+    assert table._series['00700'].last_date == np.datetime64('2026-10-16')
+
+    # 实时模式的增量更新重新抓取日线，返回包含新交易日的完整数据
+    store.ingest('00700', daily_frame(DATES, TURNOVER))
+    assert table.sync() == 1
+    series = table._series['00700']
+    assert series.last_date == np.datetime64('2026-10-19')
+    assert series.periods[-1][1] == 4.0
+    assert series.periods[-2][1] == 15.0
+
+    growth = table.growth_table(include_current=True)
+    assert growth.iloc[0]['最近交易日'] == '2026-W43'
+
+
+def test_live_refresh_adds_new_day_to_current_period(monkeypatch):
+    """update_turnover_growth 为日线过期的股票重新抓取后，周汇总包含新交易日"""
+    pytest.importorskip('akshare')
+    pytest.importorskip('streamlit')
+    import hk_volume_filter
+
+    today = pd.Timestamp.today().normalize()
+    latest = pd.Timestamp(hk_volume_filter.last_completed_session(today.date().isoformat()))
+    dates = pd.bdate_range(end=latest, periods=30)
+    volume = np.arange(1, len(dates) + 1, dtype=float)
+
+    store = HistoryStore()
+    store.ingest('00700', daily_frame(dates[:-1], volume[:-1]))
+    # 模拟前一天抓取的日线（同一天内已抓取过的股票不会重复抓取）
+    store._fetched_on['00700'] = (today - pd.Timedelta(days=1)).date()
+    table = PeriodTurnoverTable('W', store)
+    table.sync()
+
+    class FakeAk:
+        @staticmethod
+        def stock_hk_daily(symbol, adjust):
+            return daily_frame(dates, volume)
+
+    monkeypatch.setattr(hk_volume_filter, 'ak', FakeAk)
+    monkeypatch.setattr(hk_volume_filter.time, 'sleep', lambda seconds: None)
+    spot = pd.DataFrame({'代码': ['00700'], '名称': ['腾讯控股'], '最新价': [1.0], '成交量': [1.0], '成交额': [1.0]})
+    hk_volume_filter.update_turnover_growth(spot, store=store)
+
+    assert store.get('00700').last_date == np.datetime64(latest.date())
+    assert table.sync() == 1
+    assert table._series['00700'].last_date == np.datetime64(latest.date())